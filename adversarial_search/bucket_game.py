@@ -1,12 +1,15 @@
-State = tuple[int, list[str | int]]  # Tuple of player (whose turn it is),
-                                     # and the buckets (as str)
-                                     # or the number in a bucket
+State = list[int | list[str | int]]  # List of player (whose turn it is),
+                                    # and the buckets (as str)
+                                    # or the number in a bucket
 Action = str | int  # Bucket choice (as str) or choice of number
+Record = tuple[int, list[str | int]]  # The player and actions before a move, to undo it
+
+NEG_INF, POS_INF = float('-inf'), float('inf')
 
 
 class Game:
     def initial_state(self) -> State:
-        return 0, ['A', 'B', 'C']
+        return [0, ['A', 'B', 'C']]
 
     def to_move(self, state: State) -> int:
         player, _ = state
@@ -17,14 +20,27 @@ class Game:
         return actions
 
     def result(self, state: State, action: Action) -> State:
+        next_state = list(state)
+        self.apply(next_state, action)
+        return next_state
+
+    def apply(self, state: State, action: Action) -> Record:
+        # Makes the move in place and returns what undo() needs to take it back
+        player, actions = state
+        state[0] = (player + 1) % 2
         if action == 'A':
-            return (self.to_move(state) + 1) % 2, [-50, 50]
+            state[1] = [-50, 50]
         elif action == 'B':
-            return (self.to_move(state) + 1) % 2, [3, 1]
+            state[1] = [3, 1]
         elif action == 'C':
-            return (self.to_move(state) + 1) % 2, [-5, 15]
-        assert type(action) is int
-        return (self.to_move(state) + 1) % 2, [action]
+            state[1] = [-5, 15]
+        else:
+            assert type(action) is int
+            state[1] = [action]
+        return player, actions
+
+    def undo(self, state: State, record: Record):
+        state[0], state[1] = record
 
     def is_terminal(self, state: State) -> bool:
         _, actions = state
@@ -37,34 +53,52 @@ class Game:
         return actions[0] if player == self.to_move(state) else -actions[0]
 
     def print(self, state):
-        print(f'The state is {state} and ', end='')
+        print(f'The state is {tuple(state)} and ', end='')
         if self.is_terminal(state):
             print(f'P1\'s utility is {self.utility(state, 0)}')
         else:
             print(f'it is P{self.to_move(state)+1}\'s turn')
 
 def minimax_search(game: Game, state: State) -> Action | None:
-    player = game.to_move(state)                                # Get the current player whose turn it is
-    value, move = max_value(game, state)                        # Start the minimax algorithm by finding the maximum value move for the current player
-    return move                                                 # Return the best action (move) found by the minimax search
-
-def max_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('-inf'), float('-inf')                                  # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
+    if (game.is_terminal(state)): return None                               # The game has ended, there is no move to make
+    root_player = game.to_move(state)                                       # Get the current player whose turn it is, the search values states from this player's perspective
+    v, move, alpha = NEG_INF, None, NEG_INF                                 # The root is a maximizer, only it needs to keep track of the best action, the recursion only returns values
     for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = min_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 2 (minimizer) takes their action
+        record = game.apply(state, a)                                       # Make the move in place instead of creating a new state
+        v2 = min_value(game, state, root_player, alpha, POS_INF)            # Get the value of the resulting state after Player 2 (minimizer) takes their action
+        game.undo(state, record)                                            # Take the move back before trying the next action
         if (v2 > v):                                                        # If the value found (v2) is better than the current best (v), update v and the move
             v, move = v2, a                                                 # Keep track of the best value and associated action
-    return v, move                                                          # Return the highest value found (v) and the corresponding best action (move)
+            alpha = max(alpha, v)                                           # Update alpha to reflect the best value found so far by the maximizer
+    return move                                                             # Return the best action (move) found by the minimax search
+
+def max_value(game: Game, state: State, root_player: int, alpha, beta) -> float:
+    if (game.is_terminal(state)): return game.utility(state, root_player)   # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
+    apply, undo = game.apply, game.undo                                     # Look the methods up once instead of on every action
+    v = NEG_INF                                                             # Initialize v as negative infinity because we are looking for the maximum value
+    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
+        record = apply(state, a)                                            # Make the move in place instead of creating a new state
+        v2 = min_value(game, state, root_player, alpha, beta)               # Get the value of the resulting state after Player 2 (minimizer) takes their action
+        undo(state, record)                                                 # Take the move back before trying the next action
+        if (v2 > v):                                                        # If the value found (v2) is better than the current best (v), update v
+            v = v2                                                          # Keep track of the best value
+            alpha = max(alpha, v)                                           # Update alpha to reflect the best value found so far by the maximizer
+        if (v >= beta): return v                                            # Beta cutoff: if v is greater than or equal to beta, the minimizer will never allow this state, so the remaining branches are pruned
+    return v                                                                # Return the highest value found (v)
 
-def min_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('inf'), float('inf')                                    # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
+def min_value(game: Game, state: State, root_player: int, alpha, beta) -> float:
+    if (game.is_terminal(state)): return game.utility(state, root_player)   # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
+    apply, undo = game.apply, game.undo                                     # Look the methods up once instead of on every action
+    v = POS_INF                                                             # Initialize v as positive infinity because we are looking for the minimum value
     for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = max_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 1 (maximizer) takes their action
-        if (v2 < v):                                                        # If the value found (v2) is better (lower) than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best (smallest) value and associated action
-    return v, move                                                          # Return the lowest value found (v) and the corresponding best action (move)
+        record = apply(state, a)                                            # Make the move in place instead of creating a new state
+        v2 = max_value(game, state, root_player, alpha, beta)               # Get the value of the resulting state after Player 1 (maximizer) takes their action
+        undo(state, record)                                                 # Take the move back before trying the next action
+        if (v2 < v):                                                        # If the value found (v2) is better (lower) than the current best (v), update v
+            v = v2                                                          # Keep track of the best (smallest) value
+            beta = min(beta, v)                                             # Update beta to reflect the best value found so far by the minimizer
+        if (v <= alpha): return v                                           # Alpha cutoff: if v is less than or equal to alpha, the maximizer will never allow this state, so the remaining branches are pruned
+    return v                                                                # Return the lowest value found (v)
 
 game = Game()
 
@@ -1,7 +1,8 @@
 import math
 
-State = tuple[int, int] # Tuple of player (whose turn it is),
-                        # and the number to be decreased
+State = list[int]  # List of player (whose turn it is),
+                   # and the number to be decreased
+Record = tuple[int, int]  # The player and number before a move, to undo it
 Action = str  # Decrement (number <- number-1) or halve (number <- number / 2)
 
 class Game:
@@ -9,7 +10,7 @@ class Game:
         self.N = N
 
     def initial_state(self) -> State:
-        return 0, self.N
+        return [0, self.N]
 
     def to_move(self, state: State) -> int:
         player, _ = state
@@ -19,11 +20,22 @@ class Game:
         return ['--', '/2']
 
     def result(self, state: State, action: Action) -> State:
-        _, number = state
+        next_state = list(state)
+        self.apply(next_state, action)
+        return next_state
+
+    def apply(self, state: State, action: Action) -> Record:
+        # Makes the move in place and returns what undo() needs to take it back
+        player, number = state
+        state[0] = (player + 1) % 2
         if action == '--':
-            return (self.to_move(state) + 1) % 2, number - 1
+            state[1] = number - 1
         else:
-            return (self.to_move(state) + 1) % 2, number // 2  # Floored division
+            state[1] = number // 2  # Floored division
+        return player, number
+
+    def undo(self, state: State, record: Record):
+        state[0], state[1] = record
 
     def is_terminal(self, state: State) -> bool:
         _, number = state
@@ -45,27 +57,19 @@ class Game:
             print(f'it is P{self.to_move(state)+1}\'s turn')
 
 def minimax_search(game: Game, state: State) -> Action | None:
-    player = game.to_move(state)                                # Get the current player whose turn it is
-    value, move = max_value(game, state)                        # Start the minimax algorithm by finding the maximum value move for the current player
-    return move                                                 # Return the best action (move) found by the minimax search
-
-def max_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('-inf'), float('-inf')                                  # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = min_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 2 (minimizer) takes their action
-        if (v2 > v):                                                        # If the value found (v2) is better than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best value and associated action
-    return v, move                                                          # Return the highest value found (v) and the corresponding best action (move)
-
-def min_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('inf'), float('inf')                                    # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = max_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 1 (maximizer) takes their action
-        if (v2 < v):                                                        # If the value found (v2) is better (lower) than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best (smallest) value and associated action
-    return v, move                                                          # Return the lowest value found (v) and the corresponding best action (move)
+    if (game.is_terminal(state)): return None                               # There are no moves left to make
+    _, number = state
+    return '--' if -value(number - 1) >= -value(number // 2) else '/2'      # Pick the move leaving the opponent with the lowest value, preferring '--' on ties like a minimax search trying it first would
+
+def value(number: int) -> int:
+    # The minimax value of the game for the player to move when the number is 'number', with no search needed:
+    # 0 is a win (the opponent made the last move), 1 is a loss, every other odd number is a win since there is
+    # always a move to a lost number, and halving an even number flips the value, so the value of an even number
+    # only depends on how many times it can be halved before it is odd
+    if (number == 0): return 1
+    halvings = (number & -number).bit_length() - 1                          # The number of times 2 divides the number
+    odd_value = -1 if number >> halvings == 1 else 1                        # The value of the odd number left after halving
+    return odd_value if halvings % 2 == 0 else -odd_value
 
 game = Game(5)
 
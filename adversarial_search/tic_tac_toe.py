@@ -1,51 +1,121 @@
-from copy import deepcopy
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
 import time
 
-State = tuple[int, list[list[int | None]]]  # Tuple of player (whose turn it is),
-                                            # and board
+try:
+    import tic_tac_toe_kernel  # Compiled search, only available if Numba is installed
+except ImportError:
+    tic_tac_toe_kernel = None
+
+State = tuple[int, int, int]  # Tuple of player (whose turn it is),
+                              # and a 9-bit mask of the cells occupied by each player (x, then o),
+                              # where cell (row, col) is bit row*3 + col
 Action = tuple[int, int]  # Where to place the player's piece
 
+WIN_MASKS = (0b000_000_111, 0b000_111_000, 0b111_000_000,  # Rows
+             0b001_001_001, 0b010_010_010, 0b100_100_100,  # Columns
+             0b100_010_001, 0b001_010_100)                 # Diagonals
+IS_WIN = tuple(any(mask & line == line for line in WIN_MASKS) for mask in range(512))  # Whether each 9-bit mask of a player's cells completes a line
+FULL = 0b111_111_111
+ACTION_MASK = tuple(tuple(1 << (row * 3 + col) for col in range(3)) for row in range(3))  # The bit of each cell, indexed by row and column
+ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)  # Cells in move ordering, center first, then corners, then edges
+FREE_CELLS = tuple(  # The free cells as actions in move ordering, for each of the 512 masks of occupied cells
+    tuple((i // 3, i % 3) for i in ORDER if not occupied >> i & 1)
+    for occupied in range(512)
+)
+
+# The 8 symmetries of the board (rotations and reflections) as permutations of the cells,
+# where the symmetric board has in cell i what the board has in cell SYMS[s][i]
+SYMS = tuple(
+    tuple(f(i // 3, i % 3) for i in range(9))
+    for f in (
+        lambda r, c: r * 3 + c,
+        lambda r, c: c * 3 + 2 - r,
+        lambda r, c: (2 - r) * 3 + 2 - c,
+        lambda r, c: (2 - c) * 3 + r,
+        lambda r, c: r * 3 + 2 - c,
+        lambda r, c: (2 - r) * 3 + c,
+        lambda r, c: c * 3 + r,
+        lambda r, c: (2 - c) * 3 + 2 - r,
+    )
+)
+INVERSE_SYMS = tuple(tuple(sym.index(i) for i in range(9)) for sym in SYMS)
+SYM_TABLES = tuple(  # The symmetric version of each of the 512 possible 9-bit masks
+    tuple(sum((mask >> sym[i] & 1) << i for i in range(9)) for mask in range(512))
+    for sym in SYMS
+)
+
+MAX_DEPTH = 9  # The game never lasts more than 9 moves
+TIME_LIMIT = 1.0  # Seconds each player may spend searching for a move
+VERBOSE = False  # Print the board after every move, off so that the game loop times the search alone
+
+EXACT, LOWER, UPPER = 0, 1, 2  # Transposition table flags: the stored value is exact,
+                               # a lower bound (beta cutoff) or an upper bound (alpha cutoff)
+MIN_BOUND, MAX_BOUND = -2, 2  # Below and above every value of a state (-1, 0 or 1), used instead of -inf and +inf so all values are ints
+
 class Game:
+    def __init__(self):
+        # Transposition table mapping the canonical board key to (value, searched depth, flag, best move),
+        # where the value is seen from the perspective of the player to move and the move is for the canonical board
+        self.tt: dict[int, tuple[int, int, int, Action | None]] = {}
+
     def initial_state(self) -> State:
-        return (0, [[None, None, None], [None, None, None], [None, None, None]])
+        return (0, 0, 0)
 
     def to_move(self, state: State) -> int:
-        player_index, _ = state
-        return player_index
+        return state[0]
 
-    def actions(self, state: State) -> list[Action]:
-        _, board = state
-        actions = []
-        for row in range(3):
-            for col in range(3):
-                if board[row][col] is None:
-                    actions.append((row, col))
-        return actions
+    def actions(self, state: State) -> tuple[Action, ...]:
+        # Returns the free cells ordered by how promising they are, so alpha-beta can prune early
+        _, x_mask, o_mask = state
+        return FREE_CELLS[x_mask | o_mask]
+
+    def distinct_actions(self, state: State, actions: Sequence[Action]) -> Sequence[Action]:
+        # Removes the actions that lead to the same state as an earlier action up to symmetry,
+        # which can only happen when some symmetry maps the board onto itself
+        _, x_mask, o_mask = state
+        syms = [SYMS[s] for s in range(1, 8) if SYM_TABLES[s][x_mask] == x_mask and SYM_TABLES[s][o_mask] == o_mask]
+        if not syms:
+            return actions
+        distinct = []
+        covered = set()
+        for row, col in actions:
+            if row * 3 + col not in covered:
+                distinct.append((row, col))
+                covered.update(sym[row * 3 + col] for sym in syms)
+        return distinct
+
+    def canonical(self, state: State) -> tuple[int, int]:
+        # Returns the smallest key (both masks packed into one int) of the board among its 8 symmetries,
+        # so that symmetric boards share a key, and the symmetry that gives it
+        _, x_mask, o_mask = state
+        key, sym = x_mask | o_mask << 9, 0
+        for s in range(1, 8):
+            sym_key = SYM_TABLES[s][x_mask] | SYM_TABLES[s][o_mask] << 9
+            if sym_key < key:
+                key, sym = sym_key, s
+        return key, sym
+
+    def transform(self, action: Action, perm: tuple[int, ...]) -> Action:
+        row, col = action
+        i = perm[row * 3 + col]
+        return i // 3, i % 3
 
     def result(self, state: State, action: Action) -> State:
-        _, board = state
+        player, x_mask, o_mask = state
         row, col = action
-        next_board = deepcopy(board)
-        next_board[row][col] = self.to_move(state)
-        return (self.to_move(state) + 1) % 2, next_board
+        if player == 0:
+            return 1, x_mask | ACTION_MASK[row][col], o_mask
+        return 0, x_mask, o_mask | ACTION_MASK[row][col]
 
     def is_winner(self, state: State, player: int) -> bool:
-        _, board = state
-        for row in range(3):
-            if all(board[row][col] == player for col in range(3)):
-                return True
-        for col in range(3):
-            if all(board[row][col] == player for row in range(3)):
-                return True
-        if all(board[i][i] == player for i in range(3)):
-            return True
-        return all(board[i][2 - i] == player for i in range(3))
+        return IS_WIN[state[1 + player]]
 
     def is_terminal(self, state: State) -> bool:
-        _, board = state
-        if self.is_winner(state, (self.to_move(state) + 1) % 2):
+        player, x_mask, o_mask = state
+        if self.is_winner(state, 1 - player):
             return True
-        return all(board[row][col] is not None for row in range(3) for col in range(3))
+        return x_mask | o_mask == FULL
 
     def utility(self, state, player):
         assert self.is_terminal(state)
@@ -55,12 +125,28 @@ class Game:
             return -1
         return 0
 
+    def terminal_value(self, state: State, player: int) -> tuple[bool, int | None]:
+        # is_terminal() and utility() in one check: only the player who just moved can have won,
+        # so a single winner check decides both whether the game has ended and its value
+        to_move, x_mask, o_mask = state
+        if self.is_winner(state, 1 - to_move):
+            return True, -1 if to_move == player else 1
+        if x_mask | o_mask == FULL:
+            return True, 0
+        return False, None
+
+    def evaluate(self, state: State, player: int) -> int:
+        # Estimates the value of a non-terminal state when the search is cut off. Without a winner
+        # there is nothing to tell the state apart from a draw, wins are handled as terminal states
+        assert not self.is_terminal(state)
+        return 0
+
     def print(self, state: State):
-        _, board = state
+        _, x_mask, o_mask = state
         print()
         for row in range(3):
             cells = [
-                ' ' if board[row][col] is None else 'x' if board[row][col] == 0 else 'o'
+                'x' if x_mask & ACTION_MASK[row][col] else 'o' if o_mask & ACTION_MASK[row][col] else ' '
                 for col in range(3)
             ]
             print(f' {cells[0]} | {cells[1]} | {cells[2]}')
@@ -77,71 +163,126 @@ class Game:
         else:
             print(f'It is P{self.to_move(state)+1}\'s turn to move')
 
-def minimax_search(game: Game, state: State) -> Action | None:
-    player = game.to_move(state)                                # Get the current player whose turn it is
-    value, move = max_value(game, state)                        # Start the minimax algorithm by finding the maximum value move for the current player
-    return move                                                 # Return the best action (move) found by the minimax search
-
-def max_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('-inf'), float('-inf')                                  # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = min_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 2 (minimizer) takes their action
-        if (v2 > v):                                                        # If the value found (v2) is better than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best value and associated action
-    return v, move                                                          # Return the highest value found (v) and the corresponding best action (move)
-
-def min_value(game: Game, state: State) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # Check if the game is in a terminal state (i.e., if the game has ended), return the utility of the current state for the player
-    v, move = float('inf'), float('inf')                                    # Initialize v as negative infinity because we are looking for the maximum value and initialize 'move' as negative infinity, will be updated with the best action
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = max_value(game, game.result(state, a))                     # Get the value of the resulting state after Player 1 (maximizer) takes their action
-        if (v2 < v):                                                        # If the value found (v2) is better (lower) than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best (smallest) value and associated action
-    return v, move                                                          # Return the lowest value found (v) and the corresponding best action (move)
-
-def alpha_beta_search(game: Game, state: State) -> Action | None:
-    player = game.to_move(state)                                            # Get the current player whose turn it is
-    value, move = max_value_ab(game, state, float('-inf'), float('inf'))    # Start alpha-beta pruning search with initial alpha and beta values (-inf and +inf)
+class SearchTimeout(Exception):
+    pass
+
+def iterative_deepening_search(game: Game, state: State, time_limit: float) -> Action | None:
+    if (game.is_terminal(state)): return None                               # The game has ended, there is no move to make
+    if tic_tac_toe_kernel is not None: return minimax_search(game, state)  # The compiled search solves the game faster than any depth-limited search
+    deadline = time.monotonic() + time_limit                                # The search must be done by this time
+    move = minimax_search(game, state, 1)                                   # The first iteration always completes so there is a move to return
+    for depth in range(2, len(game.actions(state)) + 1):                    # Searching deeper than the number of free cells would give the same result
+        if (game.tt[game.canonical(state)[0]][0] != 0): break               # A forced win or loss has been found, only a draw could be changed by searching deeper
+        try:
+            move = minimax_search(game, state, depth, deadline)
+        except SearchTimeout:
+            break                                                           # Out of time, keep the move from the deepest completed search
+    return move
+
+def minimax_search(game: Game, state: State, depth: int = MAX_DEPTH, deadline: float | None = None) -> Action | None:
+    if tic_tac_toe_kernel is not None and depth >= len(game.actions(state)):  # Let the compiled search make the move when searching to the end of the game
+        player, x_mask, o_mask = state
+        cell = tic_tac_toe_kernel.best_move(x_mask, o_mask, player)
+        if cell < 0: return None                                            # The game has ended, there is no move to make
+        return cell // 3, cell % 3
+    value, move = alpha_beta(game, state, depth, deadline)                  # Start alpha-beta pruning search from the current state
     return move                                                             # Return the best action (move) found by the alpha-beta search
 
-def max_value_ab(game: Game, state: State, alpha, beta) -> tuple[float, float]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # If the game has ended, return the utility of the current state for the player
-    v = float('-inf')                                                       # Initialize v as negative infinity because we are looking for the maximum value
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = min_value_ab(game, game.result(state, a), alpha, beta)     # Get the value of the resulting state after Player 2 (minimizer) takes their action
-        if (v2 > v):                                                        # If the value found (v2) is better than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best value and associated action
-            alpha = max(alpha, v)                                           # Update alpha to reflect the best value found so far by the maximizer
-        if (v >= beta): return v, move                                      # Beta cutoff: f v is greater than or equal to beta, we can prune the remaining branches. Return immediately because further exploration is unnecessary (pruning occurs)
-    return v, move                                                          # Return the highest value found (v) and the corresponding best action (move)
-
-def min_value_ab(game: Game, state: State, alpha, beta) -> tuple[float, float | None]:
-    if (game.is_terminal(state)): return game.utility(state, player), None  # If the game has ended, return the utility of the current state for the player
-    v, move = float('inf'), float('inf')                                    # Initialize v as positive infinity because we are looking for the minimum value
-    for a in game.actions(state):                                           # Loop over all possible actions that can be taken from the current state
-        v2, a2 = max_value_ab(game, game.result(state, a), alpha, beta)     # Get the value of the resulting state after Player 1 (maximizer) takes their action
-        if (v2 < v):                                                        # If the value found (v2) is better (lower) than the current best (v), update v and the move
-            v, move = v2, a                                                 # Keep track of the best (smallest) value and associated action
-            beta = min(beta, v)                                             # Update beta to reflect the best value found so far by the minimizer
-        if (v <= alpha): return v, move                                     # Alpha cutoff: if v is less than or equal to alpha, we can prune the remaining branches. Return immediately because further exploration is unnecessary (pruning occurs)
-    return v, move                                                          # Return the lowest value found (v) and the corresponding best action (move)
-
-game = Game()
-
-state = game.initial_state()
-game.print(state)
-while not game.is_terminal(state):
-    player = game.to_move(state)
+@dataclass(slots=True)
+class Frame:
+    state: State
+    alpha: int
+    beta: int
+    depth: int
+    key: int                                                                # Transposition table key of the state
+    sym: int                                                                # Symmetry mapping the state onto its canonical board
+    actions: Iterator[Action]                                               # The actions that are left to search
+    v: int = MIN_BOUND                                                      # Start below every value, any action improves on it
+    move: Action | None = None
+    action: Action | None = None                                            # The action whose resulting state is currently being searched
+    alpha_orig: int = 0                                                     # The original window, to know what kind of bound the result is
+    beta_orig: int = 0
+
+    def __post_init__(self):
+        self.alpha_orig, self.beta_orig = self.alpha, self.beta
+
+    def propagate(self, v2: int):
+        # Takes the value of the state reached by the current action, seen from the player to move here
+        if (v2 > self.v):                                                   # If the value found (v2) is better than the current best (v), update v and the move
+            self.v, self.move = v2, self.action                             # Keep track of the best value and associated action
+            self.alpha = max(self.alpha, v2)                                # Update alpha to reflect the best value found so far by the player to move
+        if (self.v >= self.beta): self.actions = iter(())                   # Cutoff: if v is greater than or equal to beta, the opponent will never allow this state, so the remaining branches are pruned
+
+def alpha_beta(game: Game, state: State, depth: int, deadline: float | None) -> tuple[int, Action | None]:
+    # Negamax alpha-beta search, the value of every state is seen from the player to move there,
+    # so the value of a state is the negated value of the best state reached from it
+    node = expand(game, state, MIN_BOUND, MAX_BOUND, depth, True)           # Start with initial alpha and beta values (the bounds on all values)
+    if not isinstance(node, Frame): return node                             # The root state has already been resolved without searching
+    stack = [node]                                                          # Explicit stack of the states being searched, instead of recursing
+    result, transform, monotonic = game.result, game.transform, time.monotonic  # Look the functions up once instead of on every state
+    while True:
+        frame = stack[-1]
+        a = next(frame.actions, None)
+        if a is None:                                                       # All actions have been searched or pruned, so the value of the state is known
+            stack.pop()
+            store(game, frame.key, frame.v, frame.depth, frame.alpha_orig, frame.beta_orig, transform(frame.move, INVERSE_SYMS[frame.sym]))  # Store the result in the transposition table
+            if not stack: return frame.v, frame.move                        # The root has been searched, return its value and best action
+            stack[-1].propagate(-frame.v)                                   # Pass the value of the state on to the state it was reached from, where the other player is to move
+            continue
+        if (deadline is not None and monotonic() > deadline): raise SearchTimeout
+        frame.action = a
+        child = expand(game, result(frame.state, a), -frame.beta, -frame.alpha, frame.depth - 1)  # Get the resulting state after the player to move takes the action, the window is negated for the opponent
+        if isinstance(child, Frame):
+            stack.append(child)                                             # The resulting state must be searched, continue from there
+        else:
+            frame.propagate(-child[0])                                      # The resulting state was resolved right away
+
+def expand(game: Game, state: State, alpha: int, beta: int, depth: int, is_root: bool = False) -> Frame | tuple[int, Action | None]:
+    # Returns the value and best move of the state if it is known without searching, otherwise a frame to search it in
+    terminal, value = game.terminal_value(state, state[0])
+    if (terminal): return value, None                                       # If the game has ended, return the utility of the current state for the player to move
+    if (depth == 0): return game.evaluate(state, state[0]), None            # If the depth limit is reached, estimate the value of the state instead of searching further
+    actions = game.actions(state)
+    depth = min(depth, len(actions))                                        # The game ends within as many moves as there are free cells, so any deeper search gives the same value
+    key, sym = game.canonical(state)                                        # Look up the state in the transposition table, symmetric states share an entry and the player to move follows from the board
+    tt_move = None
+    entry = game.tt.get(key)                                                # One lookup instead of checking for the key and then indexing
+    if entry is not None:
+        value, tt_depth, flag, tt_move = entry
+        tt_move = game.transform(tt_move, SYMS[sym])                        # The move is stored for the canonical board, map it back onto this board
+        if (tt_depth >= depth):                                             # The stored value can only be used if it was searched at least as deep
+            if flag == EXACT: return value, tt_move                         # The stored value is exact, no need to search the state again
+            if not is_root:                                                 # The root needs its best move, and a narrower window could make every move fail low
+                if flag == LOWER: alpha = max(alpha, value)                 # The true value is at least the stored lower bound, so nothing below it matters
+                if flag == UPPER: beta = min(beta, value)                   # The true value is at most the stored upper bound, so nothing above it matters
+                if (alpha >= beta): return value, tt_move                   # The stored bound already causes a cutoff
+    if tt_move is not None:                                                 # The stored result was not enough to return, but its best move is likely to cause an early cutoff, so try it first
+        actions = [tt_move] + [a for a in actions if a != tt_move]
+    actions = game.distinct_actions(state, actions)                         # Skip actions that are symmetric to an earlier one, they have the same value
+    return Frame(state, alpha, beta, depth, key, sym, iter(actions))
+
+def store(game: Game, key: int, v: int, depth: int, alpha: int, beta: int, move: Action | None):
+    if v <= alpha:                                                          # The search failed low, so v is only an upper bound on the true value
+        flag = UPPER
+    elif v >= beta:                                                         # The search failed high, so v is only a lower bound on the true value
+        flag = LOWER
+    else:                                                                   # The value lies inside the window and is exact
+        flag = EXACT
+    game.tt[key] = (v, depth, flag, move)
+
+if __name__ == '__main__':  # Only play a game when run as a script, not when imported
+    game = Game()
 
+    state = game.initial_state()
+    if VERBOSE: game.print(state)
     start_time = time.time()
-    #action = minimax_search(game, state) # The player whose turn it is
-                                         # is the MAX player
-    action = alpha_beta_search(game, state)
+    while not game.is_terminal(state):
+        player = game.to_move(state)
+        action = iterative_deepening_search(game, state, TIME_LIMIT)  # The player whose turn it is
+                                                                      # is the MAX player
+        if VERBOSE: print(f'P{player+1}\'s action: {action}')
+        assert action is not None
+        state = game.result(state, action)
+        if VERBOSE: game.print(state)
     end_time = time.time()
-    print(f'Move runtime: {end_time-start_time} s')
-    
-    print(f'P{player+1}\'s action: {action}')
-    assert action is not None
-    state = game.result(state, action)
-    game.print(state)
+    print(f'Game runtime: {end_time-start_time} s')
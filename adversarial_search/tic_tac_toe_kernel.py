@@ -0,0 +1,117 @@
+# Alpha-beta search for tic-tac-toe compiled with Numba.
+# The board is one 9-bit mask of occupied cells per player, where cell (row, col) is bit row*3 + col,
+# so the whole search is integer arithmetic. Requires numba and numpy.
+
+import numpy as np
+from numba import njit
+
+LINES = np.array([0b000_000_111, 0b000_111_000, 0b111_000_000,  # Rows
+                  0b001_001_001, 0b010_010_010, 0b100_100_100,  # Columns
+                  0b100_010_001, 0b001_010_100],                # Diagonals
+                 dtype=np.int64)
+FULL = 0b111_111_111
+ORDER = np.array([4, 0, 2, 6, 8, 1, 3, 5, 7], dtype=np.int64)  # Center first, then corners, then edges
+OPENINGS = (4, 0, 1)  # The distinct first moves up to symmetry: center, corner and edge
+
+EXACT, LOWER, UPPER = 0, 1, 2  # Transposition table flags
+
+# Transposition table indexed by both masks packed into one int (p0 | p1 << 9), holding the packed entry
+# (value + 1) | flag << 2 | best_move << 4 | 1 << 8, with the value seen from the player to move.
+# The last bit marks the entry as stored, so an empty slot is 0
+TABLE = np.zeros(512 * 512, dtype=np.int16)
+STORED = 1 << 8
+
+
+@njit(cache=True)
+def is_winner_bits(bits):
+    for line in LINES:
+        if (bits & line) == line:
+            return True
+    return False
+
+
+@njit(cache=True)
+def probe(p0, p1, to_move, alpha, beta, table):
+    # Returns whether the state is resolved without searching it, with its value and best move if so,
+    # and the best move stored in the transposition table (-1 if none) to try first otherwise
+    if is_winner_bits(p1 if to_move == 0 else p0):  # The player who just moved has won
+        return True, -1, -1, -1
+    if p0 | p1 == FULL:  # The board is full without a winner
+        return True, 0, -1, -1
+    entry = table[p0 | p1 << 9]
+    if not entry:
+        return False, 0, -1, -1
+    value, flag, tt_move = (entry & 3) - 1, entry >> 2 & 3, entry >> 4 & 15
+    if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+        return True, value, tt_move, tt_move
+    return False, 0, -1, tt_move
+
+
+@njit(cache=True)
+def search(p0, p1, to_move, alpha, beta, table):
+    # Negamax alpha-beta search, returns the value for the player to move (-1, 0 or 1)
+    # and the cell of the best move, or -1 if the game has ended.
+    # The search runs on an explicit stack, one entry per ply, since Numba cannot cache a recursive function
+    resolved, value, move, tt_move = probe(p0, p1, to_move, alpha, beta, table)
+    if resolved:
+        return value, move
+
+    P0, P1, TO_MOVE = np.empty(10, np.int64), np.empty(10, np.int64), np.empty(10, np.int64)
+    ALPHA, BETA, ALPHA_ORIG = np.empty(10, np.int64), np.empty(10, np.int64), np.empty(10, np.int64)
+    V, MOVE, TT_MOVE = np.empty(10, np.int64), np.empty(10, np.int64), np.empty(10, np.int64)
+    NEXT, CELL = np.empty(10, np.int64), np.empty(10, np.int64)  # The next index into the move ordering, and the cell being searched
+    sp = 0
+    P0[0], P1[0], TO_MOVE[0], ALPHA[0], BETA[0], ALPHA_ORIG[0] = p0, p1, to_move, alpha, beta, alpha
+    V[0], MOVE[0], TT_MOVE[0], NEXT[0] = -2, -1, tt_move, 0
+
+    while True:
+        cell = -1
+        if V[sp] < BETA[sp]:  # No cutoff yet, find the next free cell, the best move from the transposition table first
+            occupied = P0[sp] | P1[sp]
+            while NEXT[sp] < 10:
+                k = NEXT[sp]
+                NEXT[sp] += 1
+                c = TT_MOVE[sp] if k == 0 else ORDER[k - 1]
+                if k > 0 and c == TT_MOVE[sp]:
+                    continue
+                if c >= 0 and not occupied >> c & 1:
+                    cell = c
+                    break
+
+        if cell < 0:  # All moves have been searched or pruned, store the value and pass it on to the previous ply
+            v = V[sp]
+            if v <= ALPHA_ORIG[sp]:
+                flag = UPPER
+            elif v >= BETA[sp]:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table[P0[sp] | P1[sp] << 9] = (v + 1) | flag << 2 | MOVE[sp] << 4 | STORED
+            if sp == 0:
+                return v, MOVE[0]
+            sp -= 1
+            v2 = -v
+        else:
+            CELL[sp] = cell
+            c0, c1 = (P0[sp] | 1 << cell, P1[sp]) if TO_MOVE[sp] == 0 else (P0[sp], P1[sp] | 1 << cell)
+            resolved, value, _, tt_move = probe(c0, c1, 1 - TO_MOVE[sp], -BETA[sp], -ALPHA[sp], table)
+            if not resolved:  # Search the resulting state on the next ply
+                sp += 1
+                P0[sp], P1[sp], TO_MOVE[sp] = c0, c1, 1 - TO_MOVE[sp - 1]
+                ALPHA[sp], BETA[sp], ALPHA_ORIG[sp] = -BETA[sp - 1], -ALPHA[sp - 1], -BETA[sp - 1]
+                V[sp], MOVE[sp], TT_MOVE[sp], NEXT[sp] = -2, -1, tt_move, 0
+                continue
+            v2 = -value
+
+        if v2 > V[sp]:
+            V[sp], MOVE[sp] = v2, CELL[sp]
+            ALPHA[sp] = max(ALPHA[sp], v2)
+
+
+def best_move(p0: int, p1: int, to_move: int) -> int:
+    # Returns the cell of the best move for the player to move, or -1 if the game has ended
+    if p0 | p1 == 0:  # Every first move is symmetric to the center, a corner or an edge, so only search those
+        values = [-search(1 << cell, 0, 1, -2, 2, TABLE)[0] for cell in OPENINGS]
+        return OPENINGS[values.index(max(values))]
+    _, move = search(p0, p1, to_move, -2, 2, TABLE)
+    return move
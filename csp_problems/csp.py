@@ -1,5 +1,6 @@
-from typing import Any
-from queue import Queue
+from typing import Any, Callable
+from operator import ne
+from collections import deque
 
 
 class CSP:
@@ -8,6 +9,7 @@ class CSP:
         variables: list[str],
         domains: dict[str, set],
         edges: list[tuple[str, str]],
+        constraints: dict[tuple[str, str], set] | None = None,
     ):
         """Constructs a CSP instance with the given variables, domains and edges.
         
@@ -19,31 +21,58 @@ class CSP:
             The domains of the variables
         edges : list[tuple[str, str]]
             Pairs of variables that must not be assigned the same value
+        constraints : dict[tuple[str, str], set] | None
+            Other binary constraints, mapping pairs of variables to the set of value pairs
+            they may be assigned
         """
         self.variables = variables
         self.domains = domains
         self.backtrack_counter = 0
         self.fail_counter = 0
 
-        # Binary constraints as a dictionary mapping variable pairs to a set of value pairs.
+        # Internally the variables are numbered in the order of self.variables, so the search
+        # hashes small ints instead of strings. The domains by number are the same sets as in
+        # self.domains, so changes to them are visible by name as well.
+        self.var_id = {variable: i for i, variable in enumerate(variables)}
+        self.id_domains: list[set] = [domains[variable] for variable in variables]
+
+        # Binary constraints as a dictionary mapping variable pairs to a function telling whether
+        # a pair of values is allowed, where the pair of variable numbers (i, j) is packed into the
+        # single int i * len(variables) + j. Every constraint is stored in both directions, so
+        # (j, i) maps to the same constraint as (i, j) with the values swapped. The edges are
+        # not-equal constraints, which need no value pairs at all.
         #
-        # To check if variable1=value1, variable2=value2 is in violation of a binary constraint:
+        # To check if variable i=value1, variable j=value2 is in violation of a binary constraint:
         # if (
-        #     (variable1, variable2) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable1, variable2)]
-        # ) or (
-        #     (variable2, variable1) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable2, variable1)]
+        #     i * len(self.variables) + j in self.constraint_fn and
+        #     not self.constraint_fn[i * len(self.variables) + j](value1, value2)
         # ):
         #     Violates a binary constraint
-        self.binary_constraints: dict[tuple[str, str], set] = {}
+        #
+        # The neighbors of a variable are the variables it shares a binary constraint with.
+        self.constraint_fn: dict[int, Callable[[Any, Any], bool]] = {}
+        self.neighbors: list[list[int]] = [[] for _ in variables]
         for variable1, variable2 in edges:
-            self.binary_constraints[(variable1, variable2)] = set()
-            for value1 in self.domains[variable1]:
-                for value2 in self.domains[variable2]:
-                    if value1 != value2:
-                        self.binary_constraints[(variable1, variable2)].add((value1, value2))
-                        self.binary_constraints[(variable1, variable2)].add((value2, value1))
+            self.add_constraint(variable1, variable2, ne)
+        for (variable1, variable2), allowed in (constraints or {}).items():
+            self.add_constraint(variable1, variable2, lambda value1, value2, allowed=allowed: (value1, value2) in allowed)
+
+    def arc(self, i: int, j: int) -> int: # Packs the pair of variable numbers into a constraint key
+        return i * len(self.variables) + j
+
+    def add_constraint(self, variable1: str, variable2: str, constraint: Callable[[Any, Any], bool]): # Adds a binary constraint in both directions
+        i, j = self.var_id[variable1], self.var_id[variable2]
+        if self.arc(i, j) in self.constraint_fn:  # The pair is already constrained, so both constraints must hold
+            old, new = self.constraint_fn[self.arc(i, j)], constraint
+            constraint = lambda value1, value2: old(value1, value2) and new(value1, value2)
+        else:
+            self.neighbors[i].append(j)
+            self.neighbors[j].append(i)
+        self.constraint_fn[self.arc(i, j)] = constraint
+        if constraint is ne:  # Symmetric, so the reverse direction is the same function
+            self.constraint_fn[self.arc(j, i)] = ne
+        else:
+            self.constraint_fn[self.arc(j, i)] = lambda value2, value1: constraint(value1, value2)
 
     def ac_3(self) -> bool:
         """Performs AC-3 on the CSP.
@@ -54,37 +83,46 @@ class CSP:
         bool
             False if a domain becomes empty, otherwise True
         """
+        n = len(self.variables)
 
         # Initialize the queue with all arcs in the csp (all pairs of variables with binary constraints)
-        queue = Queue()
-        for Xi in self.variables:
-            for Xj in self.variables:
-                if (Xi, Xj) in self.binary_constraints:
-                    queue.put((Xi, Xj))
-
-        while not queue.empty():
-            Xi, Xj = queue.get()  # Pop the first arc from the queue
+        queue = deque(self.constraint_fn)
+        in_queue = set(self.constraint_fn)  # The arcs currently in the queue, so no arc is added twice
+
+        while queue:
+            arc = queue.popleft()  # Pop the first arc from the queue
+            in_queue.remove(arc)
+            Xi, Xj = divmod(arc, n)
             if self.revise(Xi, Xj):  # Revise the domain of Xi based on the constraint with Xj
-                if len(self.domains[Xi]) == 0:  # If Xi's domain is empty, return False (unsolvable)
+                if len(self.id_domains[Xi]) == 0:  # If Xi's domain is empty, return False (unsolvable)
                     return False
                 # If revision was made, add all neighbors of Xi (excluding Xj) back into the queue
-                for Xk in self.variables:
-                    if Xk != Xj and (Xk, Xi) in self.binary_constraints:
-                        queue.put((Xk, Xi))
+                for Xk in self.neighbors[Xi]:
+                    if Xk != Xj and Xk * n + Xi not in in_queue:
+                        queue.append(Xk * n + Xi)
+                        in_queue.add(Xk * n + Xi)
 
         return True  # The CSP is arc-consistent
 
     
-    def revise(self, Xi: str, Xj: str) -> bool:
-        revised = False
-        for x in set(self.domains[Xi]):
-            # Check if there is any value in Xj's domain that satisfies the constraint with x
-            if not any((x, y) in self.binary_constraints.get((Xi, Xj), set()) for y in self.domains[Xj]):
-                # If no such value y exists, remove x from Xi's domain
-                self.domains[Xi].remove(x)
-                revised = True
+    def revise(self, Xi: int, Xj: int) -> bool:
+        constraint = self.constraint_fn[self.arc(Xi, Xj)]
+        domain_i, domain_j = self.id_domains[Xi], self.id_domains[Xj]
+        if constraint is ne and domain_j:
+            # For a not-equal constraint, a value of Xi only lacks support if it is the only value left for Xj
+            if len(domain_j) > 1:
+                return False
+            (y,) = domain_j
+            if y in domain_i:
+                domain_i.remove(y)
+                return True
+            return False
 
-        return revised
+        # Find the values x for which there is no value in Xj's domain that satisfies the constraint with x
+        to_remove = [x for x in domain_i if not any(constraint(x, y) for y in domain_j)]
+        # Remove them from Xi's domain
+        domain_i.difference_update(to_remove)
+        return len(to_remove) > 0
 
 
     def backtracking_search(self) -> None | dict[str, Any]:
@@ -95,19 +133,22 @@ class CSP:
         None | dict[str, Any]
             A solution if any exists, otherwise None
         """
-        def backtrack(assignment: dict[str, Any]):
+        def backtrack(assignment: dict[int, Any]):
             self.backtrack_counter += 1
             if self.is_complete(assignment):  # Check if the assignment is complete
                 return assignment  # Return the final solution
             
             var = self.select_unassigned_variable(assignment)  # Select a variable
-            for value in self.order_domain_values(var):  # Loop over values
+            for value in self.order_domain_values(var, assignment):  # Loop over values
                 if self.is_consistent(value, var, assignment):  # Check consistency
                     assignment[var] = value  # Assign value to the variable
 
-                    result = backtrack(assignment)  # Call the backtrack function recursively
-                    if result is not None:  # If a solution is found
-                        return result
+                    pruned = self.forward_check(var, value, assignment)  # Remove the neighbors' values that conflict with the assignment
+                    if pruned is not None:  # Only search further if no neighbor ran out of values
+                        result = backtrack(assignment)  # Call the backtrack function recursively
+                        self.restore(pruned)  # Put the removed values back, the solution is kept in the assignment
+                        if result is not None:  # If a solution is found
+                            return result
 
                     del assignment[var]  # Remove the assignment if it failed
 
@@ -115,35 +156,69 @@ class CSP:
             return None  # Failure if no valid solution
 
 
-        return backtrack({})
+        result = backtrack({})
+        if result is None:
+            return None
+        return {self.variables[var]: value for var, value in result.items()}  # Map the variable numbers back to their names
     
-    def is_complete(self, assignment: dict[str, Any]): # Checks if all csp variables have been added to the assignment dictionary
-        for var in self.variables:
-            if var not in assignment:
-                return False
-        return True
+    def forward_check(self, var: int, value, assignment: dict[int, Any]) -> None | dict[int, list]:
+        """Removes the values that conflict with var=value from the domains of var's unassigned neighbors.
+
+        Returns
+        -------
+        None | dict[int, list]
+            The removed values of each neighbor, or None if a neighbor has no values left,
+            in which case the domains are restored
+        """
+        pruned = {}
+        for neighbor in self.neighbors[var]:
+            if neighbor not in assignment:
+                constraint = self.constraint_fn[self.arc(var, neighbor)]
+                domain = self.id_domains[neighbor]
+                if constraint is ne:
+                    removed = [value] if value in domain else []
+                else:
+                    removed = [other for other in domain if not constraint(value, other)]
+                if removed:
+                    domain.difference_update(removed)
+                    pruned[neighbor] = removed
+                    if not domain:  # The neighbor can no longer be assigned
+                        self.restore(pruned)
+                        return None
+        return pruned
+
+    def restore(self, pruned: dict[int, list]): # Puts the values removed by forward_check() back into the domains
+        for neighbor, removed in pruned.items():
+            self.id_domains[neighbor].update(removed)
+
+    def is_complete(self, assignment: dict[int, Any]): # Checks if all csp variables have been added to the assignment dictionary
+        return len(assignment) == len(self.variables)
     
-    def select_unassigned_variable(self, assignment: dict[str, Any]): # Returns the first unassigned variable
-        for var in self.variables:
-            if var not in assignment:
-                return var
+    def select_unassigned_variable(self, assignment: dict[int, Any]): # Returns the unassigned variable with the fewest values left, breaking ties by the most constraints
+        # Forward checking keeps the domains of the unassigned variables consistent with the assignment
+        return min(
+            (var for var in range(len(self.variables)) if var not in assignment),
+            key=lambda var: (len(self.id_domains[var]), -len(self.neighbors[var])),
+        )
             
-    def order_domain_values(self, var): # Returns the domain of the variable without reordering
-        return self.domains[var]
+    def order_domain_values(self, var: int, assignment: dict[int, Any]): # Returns the domain of the variable ordered by the least constraining value first
+        def ruled_out(value): # Counts the values of the unassigned neighbors that would be ruled out by assigning value to var
+            count = 0
+            for neighbor in self.neighbors[var]:
+                if neighbor not in assignment:
+                    constraint = self.constraint_fn[self.arc(var, neighbor)]
+                    if constraint is ne:
+                        count += value in self.id_domains[neighbor]
+                    else:
+                        count += sum(1 for other in self.id_domains[neighbor] if not constraint(value, other))
+            return count
+
+        return sorted(self.id_domains[var], key=ruled_out)
          
-    def is_consistent(self, value, var, assignment: dict[str, Any]): # Checks if there are any constraint violations
-        for neighbor in self.variables: # Check against all variables assigned so far in the assignment
-            if neighbor in assignment:
-                neighbor_value = assignment[neighbor]
-                # Check if the assignment violates a binary constraint
-                if (
-                    (var, neighbor) in self.binary_constraints and
-                    (value, neighbor_value) not in self.binary_constraints[(var, neighbor)]
-                ) or (
-                    (neighbor, var) in self.binary_constraints and
-                    (neighbor_value, value) not in self.binary_constraints[(neighbor, var)]
-                ):
-                    return False  # Violates a constraint
+    def is_consistent(self, value, var: int, assignment: dict[int, Any]): # Checks if there are any constraint violations
+        for neighbor in self.neighbors[var]: # Check against the assigned variables that share a constraint with var
+            if neighbor in assignment and not self.constraint_fn[self.arc(var, neighbor)](value, assignment[neighbor]):
+                return False  # Violates a constraint
         return True  # No violations
 
 
@@ -162,3 +237,19 @@ def alldiff(variables: list[str]) -> list[tuple[str, str]]:
         List of edges in the form (a, b)
     """
     return [(variables[i], variables[j]) for i in range(len(variables) - 1) for j in range(i + 1, len(variables))]
+
+
+if __name__ == '__main__':
+    # A pair constrained in both orders must satisfy both constraints: a < b and b < a can't both hold
+    csp = CSP(['a', 'b'], {'a': {1, 2, 3}, 'b': {1, 2, 3}}, [], {
+        ('a', 'b'): {(1, 2), (1, 3), (2, 3)},
+        ('b', 'a'): {(1, 2), (1, 3), (2, 3)},
+    })
+    assert csp.backtracking_search() is None
+    csp = CSP(['a', 'b'], {'a': {1, 2, 3}, 'b': {1, 2, 3}}, [('a', 'b')], {
+        ('a', 'b'): {(1, 1), (1, 2), (2, 3)},
+        ('b', 'a'): {(1, 1), (3, 2), (3, 3)},
+    })
+    assert csp.backtracking_search() == {'a': 2, 'b': 3}
+    assert csp.ac_3() and csp.domains == {'a': {2}, 'b': {3}}
+    print('ok')